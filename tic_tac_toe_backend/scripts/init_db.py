@@ -0,0 +1,18 @@
+import asyncio
+
+from src.api.db import Base, engine
+from src.api import models_sql  # noqa: F401  registers the tables on Base.metadata
+from scripts.migrate_game_state import migrate_game_state
+
+
+async def init_db():
+    """Create the database schema (run once per deploy, before starting the API workers)."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        # create_all never alters existing tables; bring older games tables up to date
+        await migrate_game_state(conn)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(init_db())
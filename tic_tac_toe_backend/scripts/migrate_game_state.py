@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+from sqlalchemy import Integer, LargeBinary, column, inspect, table, text, update
+
+from src.api.db import engine
+from src.api.game_logic import decode_moves, encode_move
+
+# Position columns added to games after rows already existed
+STATE_COLUMNS = ("board_x_mask", "board_o_mask", "move_count")
+# Packed moves are written here while the legacy JSON moves column still exists, then renamed over it
+PACKED_COLUMN = "moves_packed"
+
+# Just the games columns this script writes, including the temporary one the models don't know
+_games = table(
+    "games",
+    column("id", Integer),
+    column(PACKED_COLUMN, LargeBinary),
+    *(column(name, Integer) for name in STATE_COLUMNS),
+)
+
+
+def _stored_moves(raw):
+    """(row, col, player) tuples from a moves value stored as packed bytes or as the legacy JSON list."""
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+        return decode_moves(bytes(raw))
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    return [(m["row"], m["col"], m["player"]) for m in raw or []]
+
+
+def _position(moves):
+    """(board_x_mask, board_o_mask, move_count) after replaying moves."""
+    x_mask, o_mask = 0, 0
+    for row, col, player in moves:
+        if player == "X":
+            x_mask |= 1 << (row * 3 + col)
+        else:
+            o_mask |= 1 << (row * 3 + col)
+    return x_mask, o_mask, len(moves)
+
+
+async def migrate_game_state(conn):
+    """
+    Bring an older games table up to the current layout; a no-op once it is there.
+
+    Adds the missing position columns, converts a JSON moves column to packed bytes
+    (one encode_move byte per move) and backfills each game's position from its moves.
+    """
+    columns = await conn.run_sync(lambda c: {col["name"]: col["type"] for col in inspect(c).get_columns("games")})
+    for name in STATE_COLUMNS:
+        if name not in columns:
+            await conn.execute(text(f"ALTER TABLE games ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+    # A moves column that is not binary still holds the legacy JSON list, so every row is re-encoded
+    repack = not isinstance(columns["moves"], LargeBinary)
+    if repack and PACKED_COLUMN not in columns:
+        binary = LargeBinary().compile(dialect=conn.dialect)
+        await conn.execute(text(f"ALTER TABLE games ADD COLUMN {PACKED_COLUMN} {binary}"))
+    # Otherwise only games with moves but no recorded position (they predate the columns) are replayed
+    query = "SELECT id, moves, move_count FROM games"
+    if not repack:
+        query += " WHERE move_count = 0 AND moves IS NOT NULL"
+    rows = (await conn.execute(text(query))).all()
+    for game_id, raw, move_count in rows:
+        moves = _stored_moves(raw)
+        values = {}
+        if repack:
+            values[PACKED_COLUMN] = bytes(encode_move(row, col, player) for row, col, player in moves)
+        if moves and move_count == 0:
+            values.update(zip(STATE_COLUMNS, _position(moves)))
+        if values:
+            await conn.execute(update(_games).where(_games.c.id == game_id).values(**values))
+    if repack:
+        await conn.execute(text("ALTER TABLE games DROP COLUMN moves"))
+        await conn.execute(text(f"ALTER TABLE games RENAME COLUMN {PACKED_COLUMN} TO moves"))
+
+
+async def main():
+    async with engine.begin() as conn:
+        await migrate_game_state(conn)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
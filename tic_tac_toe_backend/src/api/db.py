@@ -1,8 +1,7 @@
 import os
+from sqlalchemy.engine import URL, make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,15 +10,39 @@ DATABASE_URL = os.environ.get("DATABASE_URL")
 if not DATABASE_URL:
     raise Exception("DATABASE_URL not set in environment (.env) file.")
 
-engine = create_engine(DATABASE_URL, poolclass=NullPool)
-SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+# Sync driver names as they appear in DATABASE_URL, and the async driver that serves each backend
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgresql+pg8000": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+# PUBLIC_INTERFACE
+def to_async_url(database_url: str) -> URL:
+    """Return database_url with its driver swapped for the async one (already-async URLs pass through)."""
+    url = make_url(database_url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+
+# Pooled connections; sessions are returned to the pool per request by get_db.
+# Pool sizing only applies to server databases (SQLite uses a pool without those settings).
+engine_options = {"pool_pre_ping": True, "pool_recycle": 1800}
+if ASYNC_DATABASE_URL.get_backend_name() == "postgresql":
+    engine_options.update(
+        pool_size=int(os.environ.get("DB_POOL_SIZE", "20")),
+        max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", "20")),
+    )
+engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options)
+# expire_on_commit=False: attributes stay readable after commit without an implicit (sync) reload
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # PUBLIC_INTERFACE
-def get_db():
+async def get_db():
     """Get a new DB session."""
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
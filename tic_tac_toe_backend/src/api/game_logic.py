@@ -1,6 +1,40 @@
-from typing import List, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import os
 import random
 
+# Winning lines as 9-bit masks; cell (row, col) maps to bit row * 3 + col.
+WIN_MASKS = (
+    0b111000000, 0b000111000, 0b000000111,  # rows
+    0b100100100, 0b010010010, 0b001001001,  # columns
+    0b100010001, 0b001010100,               # diagonals
+)
+FULL_BOARD = 0b111111111
+# (row, col) of every cell, indexed by bit position
+CELLS = tuple((r, c) for r in range(3) for c in range(3))
+
+# The 8 symmetries of the square (rotations and reflections) as cell permutations:
+# _SYM_PERMS[t][i] is the cell that cell i moves to under transform t.
+_SYM_PERMS = tuple(
+    tuple(f(r, c)[0] * 3 + f(r, c)[1] for r, c in CELLS)
+    for f in (
+        lambda r, c: (r, c),
+        lambda r, c: (c, 2 - r),
+        lambda r, c: (2 - r, 2 - c),
+        lambda r, c: (2 - c, r),
+        lambda r, c: (r, 2 - c),
+        lambda r, c: (2 - r, c),
+        lambda r, c: (c, r),
+        lambda r, c: (2 - c, 2 - r),
+    )
+)
+_SYM_INVERSE = tuple(tuple(perm.index(i) for i in range(9)) for perm in _SYM_PERMS)
+# _SYM_MASKS[t][mask] is mask with every cell moved by transform t
+_SYM_MASKS = tuple(
+    tuple(sum(1 << perm[i] for i in range(9) if (mask >> i) & 1) for mask in range(1 << 9))
+    for perm in _SYM_PERMS
+)
+
 def empty_board() -> List[List[Optional[str]]]:
     """Create and return an empty 3x3 tic tac toe board."""
     return [[None for _ in range(3)] for _ in range(3)]
@@ -20,28 +54,50 @@ def apply_move(board: List[List[Optional[str]]], row: int, col: int, symbol: str
     return new_board
 
 # PUBLIC_INTERFACE
-def check_winner(board: List[List[Optional[str]]]) -> Optional[str]:
-    """Return 'X', 'O', or None if no winner yet."""
-    lines = []
+def board_to_masks(board: List[List[Optional[str]]]) -> Tuple[int, int]:
+    """Encode the board as (x_mask, o_mask) bitmasks, one bit per cell."""
+    x_mask, o_mask = 0, 0
+    for i, (r, c) in enumerate(CELLS):
+        cell = board[r][c]
+        if cell == "X":
+            x_mask |= 1 << i
+        elif cell == "O":
+            o_mask |= 1 << i
+    return x_mask, o_mask
 
-    # Rows and columns
-    for i in range(3):
-        lines.append(board[i])
-        lines.append([board[0][i], board[1][i], board[2][i]])
+# PUBLIC_INTERFACE
+def masks_to_board(x_mask: int, o_mask: int) -> List[List[Optional[str]]]:
+    """Decode (x_mask, o_mask) bitmasks back into a 3x3 board."""
+    board = empty_board()
+    for i, (r, c) in enumerate(CELLS):
+        if (x_mask >> i) & 1:
+            board[r][c] = "X"
+        elif (o_mask >> i) & 1:
+            board[r][c] = "O"
+    return board
 
-    # Diagonals
-    lines.append([board[0][0], board[1][1], board[2][2]])
-    lines.append([board[0][2], board[1][1], board[2][0]])
+# PUBLIC_INTERFACE
+def has_line(mask: int) -> bool:
+    """True if the player mask covers any winning line."""
+    for m in WIN_MASKS:
+        if mask & m == m:
+            return True
+    return False
 
-    for line in lines:
-        if line[0] is not None and line[0] == line[1] == line[2]:
-            return line[0]
+# PUBLIC_INTERFACE
+def winner_from_masks(x_mask: int, o_mask: int) -> Optional[str]:
+    """Return 'X', 'O', or None if no winner yet, from player bitmasks."""
+    for m in WIN_MASKS:
+        if x_mask & m == m:
+            return "X"
+        if o_mask & m == m:
+            return "O"
     return None
 
 # PUBLIC_INTERFACE
-def is_board_full(board: List[List[Optional[str]]]) -> bool:
-    """True if no empty cells on the board."""
-    return all(cell is not None for row in board for cell in row)
+def check_winner(board: List[List[Optional[str]]]) -> Optional[str]:
+    """Return 'X', 'O', or None if no winner yet."""
+    return winner_from_masks(*board_to_masks(board))
 
 # PUBLIC_INTERFACE
 def next_turn(current: str) -> str:
@@ -49,28 +105,84 @@ def next_turn(current: str) -> str:
     return "O" if current == "X" else "X"
 
 # PUBLIC_INTERFACE
-def best_ai_move(board: List[List[Optional[str]]], ai_symbol: str, user_symbol: str) -> Tuple[int, int]:
-    """Simple AI: win if possible, block if must, else random empty."""
+def encode_move(row: int, col: int, player: str) -> int:
+    """Pack a move into one byte: row (2 bits), col (2 bits), player (1 bit, 0 = 'X')."""
+    return ((row << 2) | col) << 1 | (0 if player == "X" else 1)
+
+# PUBLIC_INTERFACE
+def decode_moves(data: Optional[bytes]) -> List[Tuple[int, int, str]]:
+    """Unpack a stored move blob into (row, col, player) tuples."""
+    return [(b >> 3, (b >> 1) & 3, "O" if b & 1 else "X") for b in (data or b"")]
+
+def _canonical(x_mask: int, o_mask: int) -> Tuple[int, int, int]:
+    """Smallest (x_mask, o_mask) over all board symmetries, plus the transform that produced it."""
+    return min((table[x_mask], table[o_mask], t) for t, table in enumerate(_SYM_MASKS))
+
+@lru_cache(maxsize=8192)
+def _forced_move(x_mask: int, o_mask: int, ai_symbol: str) -> Optional[int]:
+    """Cell index that wins for ai_symbol, else one that blocks the user; None if neither."""
+    ai_mask, user_mask = (x_mask, o_mask) if ai_symbol == "X" else (o_mask, x_mask)
+    free = [i for i in range(9) if not ((x_mask | o_mask) >> i) & 1]
     # Try to win
-    for r in range(3):
-        for c in range(3):
-            if board[r][c] is None:
-                temp = [row.copy() for row in board]
-                temp[r][c] = ai_symbol
-                if check_winner(temp) == ai_symbol:
-                    return (r, c)
+    for i in free:
+        if has_line(ai_mask | (1 << i)):
+            return i
     # Try to block user's win
-    for r in range(3):
-        for c in range(3):
-            if board[r][c] is None:
-                temp = [row.copy() for row in board]
-                temp[r][c] = user_symbol
-                if check_winner(temp) == user_symbol:
-                    return (r, c)
+    for i in free:
+        if has_line(user_mask | (1 << i)):
+            return i
+    return None
+
+def _solve_forced(x_mask: int, o_mask: int, ai_symbol: str) -> Optional[int]:
+    """Forced cell for this exact board, computed on its canonical form."""
+    # Symmetric positions share one cache entry; map the answer back to this board
+    canon_x, canon_o, t = _canonical(x_mask, o_mask)
+    forced = _forced_move(canon_x, canon_o, ai_symbol)
+    return None if forced is None else _SYM_INVERSE[t][forced]
+
+def _build_ai_table() -> Dict[Tuple[int, int], Optional[int]]:
+    """Forced 'O' reply for every reachable position where O is to move (X opens)."""
+    table: Dict[Tuple[int, int], Optional[int]] = {}
+    stack = [(0, 0)]
+    seen = {(0, 0)}
+    while stack:
+        x_mask, o_mask = stack.pop()
+        if winner_from_masks(x_mask, o_mask) is not None or (x_mask | o_mask) == FULL_BOARD:
+            continue
+        x_to_move = bin(x_mask).count("1") == bin(o_mask).count("1")
+        if not x_to_move:
+            table[(x_mask, o_mask)] = _solve_forced(x_mask, o_mask, "O")
+        for i in range(9):
+            if not ((x_mask | o_mask) >> i) & 1:
+                nxt = (x_mask | (1 << i), o_mask) if x_to_move else (x_mask, o_mask | (1 << i))
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+    return table
+
+# PUBLIC_INTERFACE
+def best_ai_move_masks(x_mask: int, o_mask: int, ai_symbol: str) -> Tuple[int, int]:
+    """Simple AI on bitmasks: win if possible, block if must, else random empty."""
+    if ai_symbol == "O" and (x_mask, o_mask) in _AI_TABLE:
+        forced = _AI_TABLE[(x_mask, o_mask)]
+    else:
+        forced = _solve_forced(x_mask, o_mask, ai_symbol)
+    if forced is not None:
+        return CELLS[forced]
     # Pick random empty
-    empty = [(r, c) for r in range(3) for c in range(3) if board[r][c] is None]
-    if empty:
-        return random.choice(empty)
+    free = [i for i in range(9) if not ((x_mask | o_mask) >> i) & 1]
+    if free:
+        return CELLS[random.choice(free)]
     else:
         raise Exception("No moves left")
 
+# PUBLIC_INTERFACE
+def best_ai_move(board: List[List[Optional[str]]], ai_symbol: str, user_symbol: str) -> Tuple[int, int]:
+    """Simple AI: win if possible, block if must, else random empty."""
+    x_mask, o_mask = board_to_masks(board)
+    return best_ai_move_masks(x_mask, o_mask, ai_symbol)
+
+# Whole 'O' policy precomputed at import; set AI_TABLE_PRECOMPUTE=0 to compute lazily instead
+_AI_TABLE: Dict[Tuple[int, int], Optional[int]] = (
+    _build_ai_table() if os.environ.get("AI_TABLE_PRECOMPUTE", "1") != "0" else {}
+)
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict, NamedTuple, Optional
+from cachetools import LRUCache
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import SessionLocal
+from .models_sql import Game
+
+logger = logging.getLogger("uvicorn.error")
+
+# In-flight games kept in process memory: read-through on miss, write-through on every move.
+# Each worker has its own cache, so every write is conditional on the move_count it was based on;
+# a snapshot made stale by another worker fails that check instead of overwriting the row.
+GAME_CACHE_MAXSIZE = int(os.environ.get("GAME_CACHE_MAXSIZE", "10000"))
+_game_cache = LRUCache(maxsize=GAME_CACHE_MAXSIZE)
+_game_cache_lock = threading.Lock()
+
+# Optional write-behind (off by default): moves are queued per game and flushed every interval.
+# A move can be lost if the process dies within that window, and queued moves are acknowledged
+# before any conflict check can run, so only enable it when the API runs as a single worker.
+WRITE_BEHIND_INTERVAL_MS = int(os.environ.get("WRITE_BEHIND_INTERVAL_MS", "0"))
+
+# PUBLIC_INTERFACE
+class StaleGameError(Exception):
+    """The game row changed since this process read it (e.g. a move served by another worker)."""
+
+# PUBLIC_INTERFACE
+class GameSnapshot(NamedTuple):
+    """Everything the move endpoint needs to know about a game."""
+    user_x_id: Optional[int]
+    user_o_id: Optional[int]
+    is_pvp: bool
+    board_x_mask: int
+    board_o_mask: int
+    move_count: int
+    moves: bytes
+    winner: Optional[str]
+
+class _PendingWrite(NamedTuple):
+    """Latest queued state of a game and the move_count its row had when it was last written."""
+    snapshot: GameSnapshot
+    finished: bool
+    base_move_count: int
+
+_pending: Dict[int, _PendingWrite] = {}
+
+# PUBLIC_INTERFACE
+async def load_game(db: AsyncSession, game_id: int) -> Optional[GameSnapshot]:
+    """Return the cached game state, loading it from the database on a miss."""
+    with _game_cache_lock:
+        snapshot = _game_cache.get(game_id)
+        if snapshot is None and game_id in _pending:
+            # Evicted from the LRU before its queued write reached the database
+            snapshot = _pending[game_id].snapshot
+    if snapshot is not None:
+        return snapshot
+    game = await db.get(Game, game_id)
+    if game is None:
+        return None
+    snapshot = GameSnapshot(
+        user_x_id=game.user_x_id,
+        user_o_id=game.user_o_id,
+        is_pvp=game.is_pvp,
+        board_x_mask=game.board_x_mask,
+        board_o_mask=game.board_o_mask,
+        move_count=game.move_count,
+        moves=game.moves or b"",
+        winner=game.winner,
+    )
+    with _game_cache_lock:
+        # A concurrent move may have cached a newer state while we were reading
+        return _game_cache.setdefault(game_id, snapshot)
+
+async def _write_game(db: AsyncSession, game_id: int, snapshot: GameSnapshot, expected_move_count: int) -> bool:
+    """UPDATE the game row only if it is still at expected_move_count; False if it has moved on."""
+    result = await db.execute(
+        update(Game).where(Game.id == game_id, Game.move_count == expected_move_count).values(
+            moves=snapshot.moves,
+            board_x_mask=snapshot.board_x_mask,
+            board_o_mask=snapshot.board_o_mask,
+            move_count=snapshot.move_count,
+            winner=snapshot.winner,
+        ).execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+async def _write_pending(db: AsyncSession, batch: Dict[int, _PendingWrite]):
+    """Persist queued game states in one transaction, each conditional on its row's move_count."""
+    stale = set()
+    for game_id, entry in batch.items():
+        if not await _write_game(db, game_id, entry.snapshot, entry.base_move_count):
+            stale.add(game_id)
+    await db.commit()
+    with _game_cache_lock:
+        for game_id, entry in batch.items():
+            if game_id in stale:
+                # The row moved on elsewhere; queued moves built on it cannot be applied
+                _pending.pop(game_id, None)
+                _game_cache.pop(game_id, None)
+                continue
+            queued = _pending.get(game_id)
+            if queued is entry:
+                del _pending[game_id]
+            elif queued is not None:
+                # A newer move was queued during the flush; it now builds on what was just written
+                _pending[game_id] = queued._replace(base_move_count=entry.snapshot.move_count)
+            if entry.finished and game_id not in _pending:
+                _game_cache.pop(game_id, None)
+    for game_id in stale:
+        logger.warning("Dropped queued moves for game %s: row changed outside this worker", game_id)
+
+# PUBLIC_INTERFACE
+def forget_game(game_id: int):
+    """Drop a game from the cache so the next request reads it again."""
+    with _game_cache_lock:
+        _game_cache.pop(game_id, None)
+
+# PUBLIC_INTERFACE
+async def save_game(db: AsyncSession, game_id: int, snapshot: GameSnapshot, finished: bool,
+                    expected_move_count: int):
+    """
+    Record the new game state in the cache and queue (or, with write-behind off, perform) its write.
+
+    expected_move_count is the move_count the new state was computed from. A write-through that
+    finds the row elsewhere evicts the game and raises StaleGameError.
+    """
+    if WRITE_BEHIND_INTERVAL_MS > 0:
+        with _game_cache_lock:
+            # Moves coalesced into one queued write keep the row's move_count from the last flush
+            queued = _pending.get(game_id)
+            base = queued.base_move_count if queued else expected_move_count
+            _game_cache[game_id] = snapshot
+            _pending[game_id] = _PendingWrite(snapshot, finished, base)
+        return
+    written = await _write_game(db, game_id, snapshot, expected_move_count)
+    await db.commit()
+    with _game_cache_lock:
+        # Cache only what the database accepted; stale or finished games are re-read next time
+        if written and not finished:
+            _game_cache[game_id] = snapshot
+        else:
+            _game_cache.pop(game_id, None)
+    if not written:
+        raise StaleGameError(game_id)
+
+# PUBLIC_INTERFACE
+async def flush_pending():
+    """Write every queued game state to the database."""
+    with _game_cache_lock:
+        batch = dict(_pending)
+    if batch:
+        async with SessionLocal() as db:
+            await _write_pending(db, batch)
+
+# PUBLIC_INTERFACE
+async def run_write_behind():
+    """Flush queued game writes every WRITE_BEHIND_INTERVAL_MS until cancelled."""
+    while True:
+        await asyncio.sleep(WRITE_BEHIND_INTERVAL_MS / 1000)
+        try:
+            await flush_pending()
+        except Exception:
+            # Entries stay queued and are retried on the next tick
+            logger.exception("Write-behind flush failed")
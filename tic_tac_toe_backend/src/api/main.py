@@ -1,27 +1,39 @@
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager, suppress
+from cachetools import TTLCache
 from fastapi import FastAPI, HTTPException, Depends, Body
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, func, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, joinedload
 from typing import List
 from datetime import datetime, timedelta
 
 from .models import (
     UserRegister, UserOut, Token,
-    Move, GameState, GameRecord,
+    GameState, GameRecord,
     UserStats, LeaderboardEntry, SessionInfo
 )
-from .db import get_db, Base, engine
+from .db import get_db
 from .models_sql import User, Game
+from .game_store import (
+    WRITE_BEHIND_INTERVAL_MS, StaleGameError, load_game, save_game, forget_game,
+    flush_pending, run_write_behind
+)
 from .security import (
-    get_password_hash, create_access_token, get_current_user, authenticate_user
+    get_password_hash, create_access_token, get_current_user, authenticate_user,
+    log_password_hash_cost
 )
 from .game_logic import (
-    empty_board, validate_move, apply_move, check_winner,
-    is_board_full, next_turn, best_ai_move
+    empty_board, masks_to_board, winner_from_masks, best_ai_move_masks,
+    encode_move, decode_moves
 )
 
-# import os  # Unused
-
 tags_metadata = [
     {
         "name": "auth",
@@ -41,11 +53,26 @@ tags_metadata = [
     },
 ]
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # DB schema is created once per deploy by scripts/init_db.py, not by every worker
+    await run_in_threadpool(log_password_hash_cost)
+    flusher = asyncio.create_task(run_write_behind()) if WRITE_BEHIND_INTERVAL_MS > 0 else None
+    yield
+    # Drain queued moves before the process exits
+    if flusher:
+        flusher.cancel()
+        with suppress(asyncio.CancelledError):
+            await flusher
+    await flush_pending()
+
 app = FastAPI(
     title="Tic Tac Toe API",
     description="Backend for a persistent Tic Tac Toe game application. Implements users, authentication, PvP and AI games, persistent stats.",
     version="1.0.0",
-    openapi_tags=tags_metadata
+    openapi_tags=tags_metadata,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -56,34 +83,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create DB schema (for demonstration - in prod: use migration)
-Base.metadata.create_all(bind=engine)
-
 #---------- User Registration/Login/Auth ----------
 
 # PUBLIC_INTERFACE
 @app.post("/auth/register", response_model=UserOut, tags=["auth"], summary="Register a new user")
-def register_user(reg: UserRegister, db: Session = Depends(get_db)):
+async def register_user(reg: UserRegister, db: AsyncSession = Depends(get_db)):
     """Register a new user. Usernames must be unique."""
-    existing = db.query(User).filter(User.username == reg.username).first()
+    existing = (await db.execute(select(User).where(User.username == reg.username))).scalars().first()
     if existing:
         raise HTTPException(status_code=409, detail="Username taken")
     user = User(
         username=reg.username,
-        hashed_password=get_password_hash(reg.password)
+        hashed_password=await run_in_threadpool(get_password_hash, reg.password)
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
     return UserOut(id=user.id, username=user.username)
 
 # PUBLIC_INTERFACE
 @app.post("/auth/token", response_model=Token, tags=["auth"], summary="Login and get Auth Token")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """
     Authenticate user and issue JWT token for session management.
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
     access_token = create_access_token(
@@ -94,13 +117,13 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 
 # PUBLIC_INTERFACE
 @app.get("/auth/me", response_model=UserOut, tags=["auth"], summary="Get current user info")
-def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: User = Depends(get_current_user)):
     """Get information about the currently authenticated user."""
     return UserOut(id=current_user.id, username=current_user.username)
 
 # PUBLIC_INTERFACE
 @app.get("/auth/session", response_model=SessionInfo, tags=["auth"], summary="Session info")
-def get_session_info(current_user: User = Depends(get_current_user)):
+async def get_session_info(current_user: User = Depends(get_current_user)):
     """Fetch session info about current session."""
     # No explicit expiry in DB since it's JWT, but return 1-day validity for UI
     now = datetime.utcnow()
@@ -114,9 +137,9 @@ def get_session_info(current_user: User = Depends(get_current_user)):
 
 # PUBLIC_INTERFACE
 @app.post("/game/start", response_model=GameState, tags=["game"], summary="Start a new game")
-def start_game(
+async def start_game(
     pvp: bool = Body(..., embed=True, description="True for PvP, False for vs AI"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -126,13 +149,12 @@ def start_game(
     game = Game(
         user_x_id=current_user.id,
         user_o_id=None if pvp else None,  # PvP handled later
-        moves=[],
+        moves=b"",
         winner=None,
         is_pvp=pvp
     )
     db.add(game)
-    db.commit()
-    db.refresh(game)
+    await db.commit()
     state = GameState(
         board=board,
         current_turn="X",
@@ -143,160 +165,184 @@ def start_game(
 
 # PUBLIC_INTERFACE
 @app.post("/game/move", response_model=GameState, tags=["game"], summary="Make a move (PvP or vs AI)")
-def make_move(
+async def make_move(
     game_id: int = Body(..., embed=True),
     row: int = Body(..., embed=True),
     col: int = Body(..., embed=True),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Make a move on the specified game. Handles PvP and AI. Returns updated board, turn, winner, etc.
     """
-    game = db.query(Game).filter(Game.id == game_id).first()
+    game = await load_game(db, game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
-    moves = game.moves or []
-    # Rebuild board
-    board = empty_board()
-    turn = "X"
-    for m in moves:
-        board = apply_move(board, m['row'], m['col'], m['player'])
-        turn = next_turn(turn)
+    x_mask, o_mask = game.board_x_mask, game.board_o_mask
+    move_count = game.move_count
+    turn = "X" if move_count % 2 == 0 else "O"
     # Check if this is user's turn
     if (turn == "X" and game.user_x_id != current_user.id) or \
        (turn == "O" and game.user_o_id and game.user_o_id != current_user.id):
+        # The cached state may lag a move made through another worker; re-read it on retry
+        forget_game(game_id)
         raise HTTPException(status_code=403, detail="Not your turn")
     # Validate and apply move
-    if not validate_move(board, row, col):
+    if not (0 <= row < 3 and 0 <= col < 3) or ((x_mask | o_mask) >> (row * 3 + col)) & 1:
+        forget_game(game_id)
         raise HTTPException(status_code=400, detail="Invalid move")
-    moves.append({"row": row, "col": col, "player": turn})
-    board = apply_move(board, row, col, turn)
-    winner = check_winner(board)
-    is_over = winner is not None or is_board_full(board)
+    moves = game.moves + bytes([encode_move(row, col, turn)])
+    if turn == "X":
+        x_mask |= 1 << (row * 3 + col)
+    else:
+        o_mask |= 1 << (row * 3 + col)
+    move_count += 1
+    winner = winner_from_masks(x_mask, o_mask)
+    is_over = winner is not None or move_count == 9
     # If vs AI and not over, let AI play
-    if not game.is_pvp and not is_over and next_turn(turn) == "O":
-        ai_row, ai_col = best_ai_move(board, "O", "X")
-        moves.append({"row": ai_row, "col": ai_col, "player": "O"})
-        board = apply_move(board, ai_row, ai_col, "O")
-        winner = check_winner(board)
-        is_over = winner is not None or is_board_full(board)
-    # Update game record
-    game.moves = moves
-    game.winner = winner
-    db.commit()
-    return GameState(
-        board=board,
-        current_turn=next_turn(turn) if not is_over else turn,
-        is_over=is_over,
-        winner=winner
-    )
+    if not game.is_pvp and not is_over and turn == "X":
+        ai_row, ai_col = best_ai_move_masks(x_mask, o_mask, "O")
+        moves += bytes([encode_move(ai_row, ai_col, "O")])
+        o_mask |= 1 << (ai_row * 3 + ai_col)
+        move_count += 1
+        winner = winner_from_masks(x_mask, o_mask)
+        is_over = winner is not None or move_count == 9
+    # Update game record, unless another request moved the game on since we read it
+    try:
+        await save_game(db, game_id, game._replace(
+            board_x_mask=x_mask,
+            board_o_mask=o_mask,
+            move_count=move_count,
+            moves=moves,
+            winner=winner
+        ), finished=is_over, expected_move_count=game.move_count)
+    except StaleGameError:
+        raise HTTPException(status_code=409, detail="Game changed concurrently; reload and retry")
+    # Returning a Response skips response_model validation; the model still documents the schema
+    return ORJSONResponse({
+        "board": masks_to_board(x_mask, o_mask),
+        "current_turn": turn if is_over else ("X" if move_count % 2 == 0 else "O"),
+        "is_over": is_over,
+        "winner": winner,
+    })
 
 #---------- Game History APIs ----------
 
+def _game_record(g: Game) -> dict:
+    """GameRecord-shaped dict for a Game whose players were eagerly loaded."""
+    return {
+        "id": g.id,
+        "created_at": g.created_at,
+        "user_x": g.user_x.username if g.user_x else None,
+        "user_o": g.user_o.username if g.user_o else ("AI" if not g.is_pvp else None),
+        "winner": g.winner,
+        "moves": [{"row": r, "col": c, "player": p} for r, c, p in decode_moves(g.moves)],
+        "is_pvp": g.is_pvp,
+    }
+
 # PUBLIC_INTERFACE
 @app.get("/history/my", response_model=List[GameRecord], tags=["history"], summary="My games history")
-def my_games(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def my_games(db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Return game records (limited fields) for current user (as X or O).
     """
-    games = db.query(Game).filter(
-        (Game.user_x_id == current_user.id) | (Game.user_o_id == current_user.id)
-    ).order_by(Game.created_at.desc()).all()
-    records = []
-    for g in games:
-        user_x = db.query(User).filter(User.id == g.user_x_id).first()
-        user_o = db.query(User).filter(User.id == g.user_o_id).first() if g.user_o_id else None
-        records.append(GameRecord(
-            id=g.id,
-            created_at=g.created_at,
-            user_x=user_x.username if user_x else None,
-            user_o=user_o.username if user_o else ("AI" if not g.is_pvp else None),
-            winner=g.winner,
-            moves=[Move(**m) for m in g.moves] if g.moves else [],
-            is_pvp=g.is_pvp
-        ))
-    return records
+    # UNION ALL of two index range scans instead of an OR over both columns
+    user_id = current_user.id
+    mine = union_all(
+        select(Game).where(Game.user_x_id == user_id),
+        select(Game).where(
+            Game.user_o_id == user_id,
+            or_(Game.user_x_id.is_(None), Game.user_x_id != user_id)
+        ),
+    ).subquery()
+    game = aliased(Game, mine)
+    games = (await db.execute(
+        select(game).options(
+            joinedload(game.user_x), joinedload(game.user_o)
+        ).order_by(game.created_at.desc())
+    )).scalars().all()
+    # Trusted server-side data: send it as-is instead of re-validating every record against GameRecord
+    return ORJSONResponse([_game_record(g) for g in games])
 
 # PUBLIC_INTERFACE
 @app.get("/history/all", response_model=List[GameRecord], tags=["history"], summary="All games history")
-def all_games(db: Session = Depends(get_db)):
+async def all_games(db: AsyncSession = Depends(get_db)):
     """
     Return all game records (admin/stats).
     """
-    games = db.query(Game).order_by(Game.created_at.desc()).all()
-    records = []
-    for g in games:
-        user_x = db.query(User).filter(User.id == g.user_x_id).first()
-        user_o = db.query(User).filter(User.id == g.user_o_id).first() if g.user_o_id else None
-        records.append(GameRecord(
-            id=g.id,
-            created_at=g.created_at,
-            user_x=user_x.username if user_x else None,
-            user_o=user_o.username if user_o else ("AI" if not g.is_pvp else None),
-            winner=g.winner,
-            moves=[Move(**m) for m in g.moves] if g.moves else [],
-            is_pvp=g.is_pvp
-        ))
-    return records
+    games = (await db.execute(
+        select(Game).options(
+            joinedload(Game.user_x), joinedload(Game.user_o)
+        ).order_by(Game.created_at.desc())
+    )).scalars().all()
+    # Trusted server-side data: send it as-is instead of re-validating every record against GameRecord
+    return ORJSONResponse([_game_record(g) for g in games])
 
 #---------- Leaderboard & Stats ----------
 
+# The leaderboard is the same for every caller, so one cached entry serves all requests
+LEADERBOARD_SIZE = 100
+_leaderboard_cache = TTLCache(maxsize=1, ttl=float(os.environ.get("LEADERBOARD_CACHE_TTL", "30")))
+_leaderboard_cache_lock = threading.Lock()
+
 # PUBLIC_INTERFACE
 @app.get("/leaderboard", response_model=List[LeaderboardEntry], tags=["leaderboard"], summary="Top players")
-def leaderboard(db: Session = Depends(get_db)):
+async def leaderboard(db: AsyncSession = Depends(get_db)):
     """
-    Leaderboard by total wins (PvP and vs AI combined).
+    Leaderboard by total wins (PvP and vs AI combined), top LEADERBOARD_SIZE players.
     """
-    # Simpler: count each user's games won
-    all_users = db.query(User).all()
-    win_counts = {u.username: 0 for u in all_users}
-    games = db.query(Game).filter(Game.winner.in_(["X", "O"])).all()
-    for g in games:
-        if g.winner == "X" and g.user_x_id:
-            u = db.query(User).filter(User.id == g.user_x_id).first()
-            if u: win_counts[u.username] += 1
-        if g.winner == "O" and g.user_o_id:
-            u = db.query(User).filter(User.id == g.user_o_id).first()
-            if u: win_counts[u.username] += 1
-    entries = [LeaderboardEntry(username=k, wins=v) for k, v in sorted(win_counts.items(), key=lambda iv: -iv[1])]
+    with _leaderboard_cache_lock:
+        entries = _leaderboard_cache.get("leaderboard")
+    if entries is not None:
+        return entries
+    # One grouped query; the outer join keeps users without any win at 0
+    won = or_(
+        and_(Game.user_x_id == User.id, Game.winner == "X"),
+        and_(Game.user_o_id == User.id, Game.winner == "O"),
+    )
+    wins = func.count(Game.id)
+    rows = (await db.execute(
+        select(User.username, wins).outerjoin(Game, won).group_by(User.id, User.username)
+        .order_by(wins.desc(), User.username).limit(LEADERBOARD_SIZE)
+    )).all()
+    entries = [LeaderboardEntry(username=k, wins=v) for k, v in rows]
+    with _leaderboard_cache_lock:
+        _leaderboard_cache["leaderboard"] = entries
     return entries
 
 # PUBLIC_INTERFACE
 @app.get("/users/me/stats", response_model=UserStats, tags=["leaderboard"], summary="My stats")
-def user_stats(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def user_stats(db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Return stats (games played, wins, losses, draws) for logged in user.
     """
     user_id = current_user.id
-    games = db.query(Game).filter(
-        (Game.user_x_id == user_id) | (Game.user_o_id == user_id)
-    ).all()
-    wins, draws, losses = 0, 0, 0
-    for g in games:
-        user_symbol = None
-        if g.user_x_id == user_id:
-            user_symbol = "X"
-        elif g.user_o_id == user_id:
-            user_symbol = "O"
-        if g.winner == user_symbol:
-            wins += 1
-        elif g.winner is None:
-            draws += 1
-        elif g.winner in ["X", "O"]:
-            losses += 1
+    won = or_(
+        and_(Game.user_x_id == user_id, Game.winner == "X"),
+        and_(Game.user_o_id == user_id, Game.winner == "O"),
+    )
+    games_played, wins, draws = (await db.execute(
+        select(
+            func.count(Game.id),
+            func.sum(case((won, 1), else_=0)),
+            func.sum(case((Game.winner.is_(None), 1), else_=0)),
+        ).where(
+            (Game.user_x_id == user_id) | (Game.user_o_id == user_id)
+        )
+    )).one()
+    wins, draws = wins or 0, draws or 0
     return UserStats(
         username=current_user.username,
-        games_played=len(games),
+        games_played=games_played,
         wins=wins,
         draws=draws,
-        losses=losses
+        losses=games_played - wins - draws
     )
 
 #---------- Health ----------
 
 @app.get("/", tags=["default"])
-def health_check():
+async def health_check():
     """Health check endpoint."""
     return {"message": "Healthy"}
 
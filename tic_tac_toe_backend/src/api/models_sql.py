@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .db import Base
@@ -19,14 +19,16 @@ class Game(Base):
     user_o_id = Column(Integer, ForeignKey('users.id'), nullable=True)
     user_x = relationship("User", foreign_keys=[user_x_id], back_populates="games_x")
     user_o = relationship("User", foreign_keys=[user_o_id], back_populates="games_o")
-    moves = Column(JSON, default=list)
+    moves = Column(LargeBinary, default=b"")  # one byte per move, see game_logic.encode_move
+    # Current position as per-player bitmasks (bit row * 3 + col) plus ply count
+    board_x_mask = Column(Integer, default=0, nullable=False)
+    board_o_mask = Column(Integer, default=0, nullable=False)
+    move_count = Column(Integer, default=0, nullable=False)
     winner = Column(String, nullable=True) # 'X', 'O', or None
     is_pvp = Column(Boolean, default=True)
-
-class SessionToken(Base):
-    __tablename__ = "sessions"
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    token = Column(String, nullable=False, unique=True, index=True)
-    expires_at = Column(DateTime, nullable=False)
-    user = relationship("User")
+    # Per-player history is read newest-first; winner backs leaderboard/stats filters
+    __table_args__ = (
+        Index("ix_games_x_created", "user_x_id", "created_at"),
+        Index("ix_games_o_created", "user_o_id", "created_at"),
+        Index("ix_games_winner", "winner"),
+    )
@@ -1,12 +1,19 @@
+import hashlib
+import logging
 import os
+import threading
+import time
 from datetime import datetime, timedelta
+from cachetools import TTLCache
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from fastapi import HTTPException, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from .models_sql import User  # SessionToken was unused
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models_sql import User
 from .db import get_db
 
 # Load secrets
@@ -14,7 +21,22 @@ SECRET_KEY = os.environ.get("SECRET_KEY", "supersecret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # One day
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Short-lived cache of verified tokens: sha256(token)[:16] -> (user_id, username, exp)
+TOKEN_CACHE_TTL = float(os.environ.get("TOKEN_CACHE_TTL", "5"))
+TOKEN_CACHE_MAXSIZE = int(os.environ.get("TOKEN_CACHE_MAXSIZE", "10000"))
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_MAXSIZE, ttl=TOKEN_CACHE_TTL)
+_token_cache_lock = threading.Lock()
+
+# argon2id for new hashes; bcrypt hashes still verify and are re-hashed on next login.
+# Tune ARGON2_TIME_COST / ARGON2_MEMORY_COST (KiB) so one verify stays around 50ms on the host.
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", "65536"))
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__time_cost=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 
@@ -24,6 +46,18 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def log_password_hash_cost():
+    """Log the measured cost of one password verification so operators can calibrate it."""
+    sample = pwd_context.hash("calibration")
+    start = time.perf_counter()
+    pwd_context.verify("calibration", sample)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    # uvicorn's logger, so the line shows up in the server log without extra logging config
+    logging.getLogger("uvicorn.error").info(
+        "Password verify takes %.1f ms (argon2 time_cost=%d, memory_cost=%d KiB)",
+        elapsed_ms, ARGON2_TIME_COST, ARGON2_MEMORY_COST
+    )
+
 
 # PUBLIC_INTERFACE
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -38,20 +72,41 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 
-def get_user_by_username(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+async def get_user_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user_by_username(db, username)
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    # Hash verification is CPU-bound; keep it off the event loop
+    valid, new_hash = await run_in_threadpool(pwd_context.verify_and_update, password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        # Deprecated (bcrypt) or outdated parameters: upgrade the stored hash
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 # PUBLIC_INTERFACE
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    """Return current user from JWT token."""
+async def get_current_user(db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)):
+    """
+    Return current user from JWT token.
+
+    Verified tokens are cached for TOKEN_CACHE_TTL seconds; a cache hit skips JWT
+    verification and the user lookup and returns a detached User with only id and username set.
+    """
+    key = hashlib.sha256(token.encode()).digest()[:16]
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    if cached is not None:
+        user_id, username, exp = cached
+        if exp > time.time():
+            return User(id=user_id, username=username)
+        with _token_cache_lock:
+            _token_cache.pop(key, None)
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid authentication",
@@ -64,7 +119,9 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = get_user_by_username(db, username)
+    user = await get_user_by_username(db, username)
     if user is None:
         raise credentials_exception
+    with _token_cache_lock:
+        _token_cache[key] = (user.id, user.username, payload.get("exp", float("inf")))
     return user
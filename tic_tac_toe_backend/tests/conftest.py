@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# src.api.db builds its engine at import, so the test database has to be configured first
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
@@ -0,0 +1,83 @@
+import itertools
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.api import game_logic
+from src.api.game_logic import (
+    CELLS, FULL_BOARD, best_ai_move_masks, board_to_masks, decode_moves, encode_move, masks_to_board,
+    winner_from_masks,
+)
+
+
+def _all_boards():
+    """Every 3x3 board of None/'X'/'O', legal or not."""
+    for cells in itertools.product((None, "X", "O"), repeat=9):
+        yield [list(cells[r * 3:r * 3 + 3]) for r in range(3)]
+
+
+def _naive_lines(board, symbol):
+    """Cells where placing symbol completes a line, found with plain list scanning."""
+    lines = [[(r, c) for c in range(3)] for r in range(3)]
+    lines += [[(r, c) for r in range(3)] for c in range(3)]
+    lines += [[(i, i) for i in range(3)], [(i, 2 - i) for i in range(3)]]
+    found = set()
+    for line in lines:
+        values = [board[r][c] for r, c in line]
+        if values.count(symbol) == 2 and values.count(None) == 1:
+            found.add(line[values.index(None)])
+    return found
+
+
+@pytest.fixture(params=["precomputed", "lazy"])
+def ai_table(request, monkeypatch):
+    """Run AI tests against both the import-time table and the AI_TABLE_PRECOMPUTE=0 path."""
+    if request.param == "precomputed":
+        monkeypatch.setattr(game_logic, "_AI_TABLE", game_logic._build_ai_table())
+    else:
+        monkeypatch.setattr(game_logic, "_AI_TABLE", {})
+    game_logic._forced_move.cache_clear()
+
+
+def test_board_mask_round_trip():
+    for board in _all_boards():
+        assert masks_to_board(*board_to_masks(board)) == board
+
+
+def test_move_encoding_round_trip():
+    moves = [(r, c, p) for r, c in CELLS for p in ("X", "O")]
+    data = bytes(encode_move(r, c, p) for r, c, p in moves)
+    assert len(data) == len(moves)
+    assert decode_moves(data) == moves
+    assert decode_moves(b"") == []
+    assert decode_moves(None) == []
+
+
+def test_ai_move_matches_naive_win_then_block(ai_table):
+    for board in _all_boards():
+        x_mask, o_mask = board_to_masks(board)
+        # Finished games never reach the AI
+        if x_mask | o_mask == FULL_BOARD or winner_from_masks(x_mask, o_mask) is not None:
+            continue
+        for ai_symbol, user_symbol in (("X", "O"), ("O", "X")):
+            move = best_ai_move_masks(x_mask, o_mask, ai_symbol)
+            wins = _naive_lines(board, ai_symbol)
+            blocks = _naive_lines(board, user_symbol)
+            if wins:
+                assert move in wins, (board, ai_symbol)
+            elif blocks:
+                assert move in blocks, (board, ai_symbol)
+            else:
+                assert board[move[0]][move[1]] is None, (board, ai_symbol)
+
+
+def test_ai_table_precompute_can_be_disabled():
+    env = dict(os.environ, AI_TABLE_PRECOMPUTE="0")
+    result = subprocess.run(
+        [sys.executable, "-c", "from src.api.game_logic import _AI_TABLE; print(len(_AI_TABLE))"],
+        env=env, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    assert result.stdout.strip() == "0"
@@ -0,0 +1,143 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from src.api import game_store
+from src.api.db import Base, SessionLocal, engine
+from src.api.game_logic import encode_move
+from src.api.game_store import GameSnapshot, flush_pending, load_game, save_game
+from src.api.main import app
+from src.api.models_sql import Game
+from src.api.security import get_current_user
+
+PLAYER = SimpleNamespace(id=1, username="alice")
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Empty games table and caches; moves written through unless a test turns write-behind on."""
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(reset())
+    game_store._game_cache.clear()
+    game_store._pending.clear()
+    monkeypatch.setattr(game_store, "WRITE_BEHIND_INTERVAL_MS", 0)
+    app.dependency_overrides[get_current_user] = lambda: PLAYER
+    yield
+    app.dependency_overrides.clear()
+
+
+def _play(snapshot: GameSnapshot, row: int, col: int, player: str) -> GameSnapshot:
+    """snapshot with one more move applied."""
+    bit = 1 << (row * 3 + col)
+    return snapshot._replace(
+        board_x_mask=snapshot.board_x_mask | (bit if player == "X" else 0),
+        board_o_mask=snapshot.board_o_mask | (bit if player == "O" else 0),
+        move_count=snapshot.move_count + 1,
+        moves=snapshot.moves + bytes([encode_move(row, col, player)]),
+    )
+
+
+async def _new_game() -> int:
+    """Insert an empty PvP game for PLAYER as X (anyone may play O)."""
+    async with SessionLocal() as db:
+        game = Game(user_x_id=PLAYER.id, is_pvp=True, moves=b"")
+        db.add(game)
+        await db.commit()
+        return game.id
+
+
+async def _stored(game_id: int) -> GameSnapshot:
+    """The game as the database has it, bypassing this process's cache."""
+    async with SessionLocal() as db:
+        game = await db.get(Game, game_id)
+        return GameSnapshot(
+            game.user_x_id, game.user_o_id, game.is_pvp, game.board_x_mask, game.board_o_mask,
+            game.move_count, game.moves, game.winner,
+        )
+
+
+async def _write_elsewhere(game_id: int, snapshot: GameSnapshot):
+    """Write the row directly, as another worker with its own cache would."""
+    async with SessionLocal() as db:
+        await db.execute(update(Game).where(Game.id == game_id).values(
+            board_x_mask=snapshot.board_x_mask,
+            board_o_mask=snapshot.board_o_mask,
+            move_count=snapshot.move_count,
+            moves=snapshot.moves,
+        ))
+        await db.commit()
+
+
+def test_stale_cached_game_gets_409_then_retry_succeeds():
+    game_id = asyncio.run(_new_game())
+    client = TestClient(app)
+    assert client.post("/game/move", json={"game_id": game_id, "row": 0, "col": 0}).status_code == 200
+    # Another worker plays O at the centre; this process still caches the one-move game
+    elsewhere = _play(asyncio.run(_stored(game_id)), 1, 1, "O")
+    asyncio.run(_write_elsewhere(game_id, elsewhere))
+
+    response = client.post("/game/move", json={"game_id": game_id, "row": 2, "col": 2})
+    assert response.status_code == 409
+    assert game_id not in game_store._game_cache
+    assert asyncio.run(_stored(game_id)) == elsewhere
+
+    response = client.post("/game/move", json={"game_id": game_id, "row": 2, "col": 2})
+    assert response.status_code == 200
+    assert response.json()["board"] == [["X", None, None], [None, "O", None], [None, None, "X"]]
+    assert asyncio.run(_stored(game_id)).move_count == 3
+
+
+def test_rejected_move_evicts_cached_game():
+    game_id = asyncio.run(_new_game())
+    client = TestClient(app)
+    assert client.post("/game/move", json={"game_id": game_id, "row": 0, "col": 0}).status_code == 200
+    assert game_id in game_store._game_cache
+    assert client.post("/game/move", json={"game_id": game_id, "row": 0, "col": 0}).status_code == 400
+    assert game_id not in game_store._game_cache
+
+
+def test_write_behind_rebases_move_queued_during_flush(monkeypatch):
+    monkeypatch.setattr(game_store, "WRITE_BEHIND_INTERVAL_MS", 50)
+
+    async def run():
+        game_id = await _new_game()
+        async with SessionLocal() as db:
+            first = _play(await load_game(db, game_id), 0, 0, "X")
+            await save_game(db, game_id, first, finished=False, expected_move_count=0)
+            # The flusher takes its batch, then another move is queued before the batch is written
+            batch = dict(game_store._pending)
+            second = _play(first, 1, 1, "O")
+            await save_game(db, game_id, second, finished=False, expected_move_count=1)
+            await game_store._write_pending(db, batch)
+        assert game_store._pending[game_id].base_move_count == 1
+        assert (await _stored(game_id)).move_count == 1
+        await flush_pending()
+        assert game_id not in game_store._pending
+        assert await _stored(game_id) == second
+
+    asyncio.run(run())
+
+
+def test_write_behind_drops_stale_queued_write(monkeypatch):
+    monkeypatch.setattr(game_store, "WRITE_BEHIND_INTERVAL_MS", 50)
+
+    async def run():
+        game_id = await _new_game()
+        async with SessionLocal() as db:
+            loaded = await load_game(db, game_id)
+            await save_game(db, game_id, _play(loaded, 0, 0, "X"), finished=False, expected_move_count=0)
+        elsewhere = _play(loaded, 2, 2, "X")
+        await _write_elsewhere(game_id, elsewhere)
+        await flush_pending()
+        assert await _stored(game_id) == elsewhere
+        assert game_id not in game_store._pending
+        assert game_id not in game_store._game_cache
+
+    asyncio.run(run())
@@ -0,0 +1,50 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from scripts.migrate_game_state import migrate_game_state
+from src.api.game_logic import decode_moves
+
+# games as created by the original models: moves as a JSON list, no position columns
+LEGACY_GAMES = """
+CREATE TABLE games (
+    id INTEGER PRIMARY KEY,
+    created_at DATETIME,
+    user_x_id INTEGER,
+    user_o_id INTEGER,
+    moves JSON,
+    winner VARCHAR,
+    is_pvp BOOLEAN
+)
+"""
+
+
+def test_legacy_games_are_repacked_and_backfilled(tmp_path):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'legacy.db'}")
+        async with engine.begin() as conn:
+            await conn.execute(text(LEGACY_GAMES))
+            await conn.execute(text(
+                "INSERT INTO games (id, moves, is_pvp) VALUES "
+                "(1, '[{\"row\": 1, \"col\": 1, \"player\": \"X\"}, {\"row\": 0, \"col\": 2, \"player\": \"O\"}]', 0), "
+                "(2, '[]', 1), (3, NULL, 1)"
+            ))
+        # Running it again must leave the migrated table as it is
+        for _ in range(2):
+            async with engine.begin() as conn:
+                await migrate_game_state(conn)
+        async with engine.connect() as conn:
+            rows = (await conn.execute(text(
+                "SELECT id, moves, board_x_mask, board_o_mask, move_count FROM games ORDER BY id"
+            ))).all()
+        await engine.dispose()
+        return rows
+
+    rows = asyncio.run(run())
+    assert [(r[0], decode_moves(r[1]), r[2], r[3], r[4]) for r in rows] == [
+        (1, [(1, 1, "X"), (0, 2, "O")], 1 << 4, 1 << 2, 2),
+        (2, [], 0, 0, 0),
+        (3, [], 0, 0, 0),
+    ]
+    assert all(isinstance(r[1], bytes) for r in rows)